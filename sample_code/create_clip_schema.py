@@ -7,6 +7,8 @@ CLIP ViT-B-32モデルを使用したマルチモーダルコレクションを
 import weaviate
 from weaviate.classes.config import Configure, Property, DataType
 
+from schema_constants import METADATA_NESTED_PROPERTIES
+
 
 def create_clip_collection():
     """CLIP用のコレクションを作成"""
@@ -28,7 +30,12 @@ def create_clip_collection():
             properties=[
                 Property(name="text", data_type=DataType.TEXT, description="テキストデータ"),
                 Property(name="image", data_type=DataType.BLOB, description="画像データ（base64エンコード）"),
-                Property(name="metadata", data_type=DataType.TEXT, description="追加メタデータ（JSON文字列）"),
+                Property(
+                    name="metadata",
+                    data_type=DataType.OBJECT,
+                    description="追加メタデータ（カテゴリとタグ）",
+                    nested_properties=METADATA_NESTED_PROPERTIES,
+                ),
             ],
             vector_config=Configure.Vectors.multi2vec_clip(
                 image_fields=["image"],
@@ -45,7 +52,7 @@ def create_clip_collection():
         print(f"  プロパティ:")
         print(f"    - text (TEXT)")
         print(f"    - image (BLOB)")
-        print(f"    - metadata (TEXT)")
+        print(f"    - metadata (OBJECT: category, tags)")
         print(f"  ベクトライザー: multi2vec-clip (デフォルトサービス)")
 
 
@@ -8,6 +8,8 @@
 import weaviate
 from weaviate.classes.config import Configure, Property, DataType
 
+from schema_constants import METADATA_NESTED_PROPERTIES
+
 
 def create_multimodal_collections():
     """複数のマルチモーダルコレクションを作成"""
@@ -23,7 +25,12 @@ def create_multimodal_collections():
                 properties=[
                     Property(name="text", data_type=DataType.TEXT, description="テキストデータ"),
                     Property(name="image", data_type=DataType.BLOB, description="画像データ（base64エンコード）"),
-                    Property(name="metadata", data_type=DataType.TEXT, description="追加メタデータ（JSON文字列）"),
+                    Property(
+                        name="metadata",
+                        data_type=DataType.OBJECT,
+                        description="追加メタデータ（カテゴリとタグ）",
+                        nested_properties=METADATA_NESTED_PROPERTIES,
+                    ),
                 ],
                 vector_config=Configure.Vectors.multi2vec_clip(
                     image_fields=["image"],
@@ -44,7 +51,12 @@ def create_multimodal_collections():
                 properties=[
                     Property(name="text", data_type=DataType.TEXT, description="テキストデータ"),
                     Property(name="image", data_type=DataType.BLOB, description="画像データ（base64エンコード）"),
-                    Property(name="metadata", data_type=DataType.TEXT, description="追加メタデータ（JSON文字列）"),
+                    Property(
+                        name="metadata",
+                        data_type=DataType.OBJECT,
+                        description="追加メタデータ（カテゴリとタグ）",
+                        nested_properties=METADATA_NESTED_PROPERTIES,
+                    ),
                 ],
                 vector_config=Configure.Vectors.multi2vec_clip(
                     image_fields=["image"],
@@ -68,7 +80,12 @@ def create_multimodal_collections():
                     properties=[
                         Property(name="text", data_type=DataType.TEXT, description="テキストデータ"),
                         Property(name="image", data_type=DataType.BLOB, description="画像データ（base64エンコード）"),
-                        Property(name="metadata", data_type=DataType.TEXT, description="追加メタデータ（JSON文字列）"),
+                        Property(
+                            name="metadata",
+                            data_type=DataType.OBJECT,
+                            description="追加メタデータ（カテゴリとタグ）",
+                            nested_properties=METADATA_NESTED_PROPERTIES,
+                        ),
                     ],
                     vector_config=Configure.Vectors.text2vec_cohere(
                         model="embed-v4.0",  # マルチモーダル対応モデル
@@ -0,0 +1,141 @@
+"""
+画像のbase64エンコード用ヘルパー
+
+pybase64がインストールされている場合は、SIMD（SSSE3/AVX2/AVX-512/NEON）実装の
+libbase64を使用して高速にエンコードします。
+インストールされていない場合は標準ライブラリのbase64にフォールバックします。
+検索クエリ用の画像は、縮小サイズ（max_dim）を指定した場合にのみ、Pillowで縮小してから送信します。
+
+    pip install pybase64 pillow
+"""
+
+import io
+import mmap
+import os
+from collections import Counter
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import lru_cache
+from typing import Dict, Iterator, Optional, Sequence
+
+try:
+    # pybase64はインポート時にCPUに最適なSIMDエンコーダーを自動選択する
+    import pybase64 as _b64
+except ImportError:
+    import base64 as _b64
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+
+# このサイズ以上のファイルはmmapでページキャッシュを直接エンコーダーに渡す
+_MMAP_THRESHOLD = 1024 * 1024
+
+# クエリ画像の最大辺（CLIP ViT-B-32の入力は224x224のため、それより少し大きめに縮小する）
+QUERY_IMAGE_MAX_DIM = 256
+
+# 画像エンコードに使うワーカースレッド数
+ENCODE_MAX_WORKERS = min(8, os.cpu_count() or 1)
+
+
+def encode_image_to_base64(image_path: str) -> str:
+    """
+    画像ファイルをbase64エンコードする
+
+    大きな画像はmmapでOSのページキャッシュをそのままエンコーダーに渡すため、
+    ファイル全体の生バイト列をPythonのメモリにコピーしません。
+    """
+    with open(image_path, "rb") as image_file:
+        if os.fstat(image_file.fileno()).st_size < _MMAP_THRESHOLD:
+            encoded = _b64.b64encode(image_file.read())
+        else:
+            with mmap.mmap(image_file.fileno(), 0, access=mmap.ACCESS_READ) as mapped, \
+                    memoryview(mapped) as view:
+                encoded = _b64.b64encode(view)
+    # base64の出力はASCIIのみなので、utf-8より軽いasciiでデコードする
+    return encoded.decode("ascii")
+
+
+def encode_query_image(image_path: str, max_dim: Optional[int] = None) -> str:
+    """
+    検索クエリ用の画像を縮小してからbase64エンコードする
+
+    ベクトル化モデルは低い解像度の入力しか使わないため、長辺をmax_dimまで縮小し、
+    JPEG（品質85）で再圧縮して送信データ量を減らします。
+    max_dimがNoneの場合、またはPillowがインストールされていない場合は、
+    元の画像をそのままエンコードします。
+    """
+    if max_dim is None or Image is None:
+        return encode_image_to_base64(image_path)
+    
+    with Image.open(image_path) as image:
+        image.thumbnail((max_dim, max_dim), Image.BILINEAR)
+        if image.mode != "RGB":
+            image = image.convert("RGB")
+        buffer = io.BytesIO()
+        image.save(buffer, format="JPEG", quality=85)
+    return _b64.b64encode(buffer.getvalue()).decode("ascii")
+
+
+@lru_cache(maxsize=128)
+def _encode_query_image_cached(image_path: str, max_dim: Optional[int], mtime_ns: int, size: int) -> str:
+    return encode_query_image(image_path, max_dim)
+
+
+def encode_query_image_cached(image_path: str, max_dim: Optional[int] = None) -> str:
+    """
+    encode_query_image()の結果をキャッシュして返す
+
+    同じクエリ画像で繰り返し検索する場合に、ファイルの読み込みとエンコードを省略します。
+    パスに加えて更新日時とサイズをキーにするため、ファイルが更新された場合は再エンコードします。
+    """
+    stat = os.stat(image_path)
+    return _encode_query_image_cached(image_path, max_dim, stat.st_mtime_ns, stat.st_size)
+
+
+def iter_image_encodings(
+    image_paths: Sequence[Optional[str]],
+    max_workers: int = ENCODE_MAX_WORKERS
+) -> Iterator[Optional[Future]]:
+    """
+    画像パスの並びに対応するbase64エンコードのFutureを順に返す
+
+    スレッドプールで先の画像をエンコードしておきますが、先読みは2 * max_workers件までに
+    制限するため、データセット全体のエンコード結果が同時にメモリに載ることはありません。
+    同じパスは一度だけエンコードし、最後に使われた時点で解放します。
+    ファイルの読み込みに失敗した場合の例外はFuture.result()の呼び出し時に送出されます。
+
+    Args:
+        image_paths: 画像パスのリスト（画像がない要素はNone）
+        max_workers: エンコードに使うワーカースレッド数
+
+    Returns:
+        各要素に対応するFuture（画像がない要素はNone）を順に返すイテレータ
+    """
+    lookahead = 2 * max_workers
+    remaining = Counter(image_path for image_path in image_paths if image_path)
+    pending: Dict[str, Future] = {}
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        def submit(index: int):
+            image_path = image_paths[index]
+            if image_path and image_path not in pending:
+                pending[image_path] = executor.submit(encode_image_to_base64, image_path)
+
+        for index in range(min(lookahead, len(image_paths))):
+            submit(index)
+
+        for index, image_path in enumerate(image_paths):
+            if index + lookahead < len(image_paths):
+                submit(index + lookahead)
+
+            if not image_path:
+                yield None
+                continue
+
+            future = pending[image_path]
+            remaining[image_path] -= 1
+            if remaining[image_path] == 0:
+                del pending[image_path]
+            yield future
@@ -5,24 +5,100 @@
 画像はbase64エンコードしてblob型として格納します。
 """
 
+import argparse
 import weaviate
-import base64
-import json
-import os
 from pathlib import Path
-from typing import List, Dict, Optional
+from typing import List, Dict, Iterable, Iterator, Optional
 
+from fast_b64 import ENCODE_MAX_WORKERS, iter_image_encodings
 
-def encode_image_to_base64(image_path: str) -> str:
-    """画像ファイルをbase64エンコードする"""
-    with open(image_path, "rb") as image_file:
-        return base64.b64encode(image_file.read()).decode("utf-8")
+
+# テキスト中心のデータは大きめのバッチでまとめて送信し、リクエスト数を減らす
+DEFAULT_BATCH_SIZE = 100
+# 画像を含むデータは1件あたり数百KBになるため、バッチを小さくする
+IMAGE_BATCH_SIZE = 20
+
+
+def default_batch_size(data_items: List[Dict]) -> int:
+    """画像の有無に応じたバッチサイズを返す"""
+    has_images = any(item.get("image_path") for item in data_items)
+    return IMAGE_BATCH_SIZE if has_images else DEFAULT_BATCH_SIZE
+
+
+def prepare_properties(
+    data_items: List[Dict],
+    max_workers: int = ENCODE_MAX_WORKERS
+) -> Iterator[Dict]:
+    """
+    インポートするオブジェクトのプロパティを準備
+    
+    画像はスレッドプールで少し先まで先読みしてbase64エンコードするため、
+    返されたイテレータを消費しながらバッチ送信すると、エンコードと送信が並行して進みます。
+    複数のコレクションに同じデータをインポートする場合は、list()で一度だけ準備して使い回せます。
+    
+    Args:
+        data_items: インポートするデータのリスト
+                   各アイテムは {"text": str, "image_path": str, "metadata": Optional[dict]} の形式
+        max_workers: 画像のエンコードに使うワーカースレッド数
+    
+    Returns:
+        各オブジェクトのプロパティを順に返すイテレータ
+    """
+    image_paths = [item.get("image_path") for item in data_items]
+    
+    for item, encoded_image in zip(data_items, iter_image_encodings(image_paths, max_workers)):
+        # 画像ファイルをbase64エンコード
+        image_base64 = None
+        if encoded_image is not None:
+            try:
+                image_base64 = encoded_image.result()
+            except FileNotFoundError:
+                print(f"⚠ 画像ファイルが見つかりません: {item['image_path']}")
+        
+        # プロパティを準備
+        properties = {
+            "text": item.get("text", ""),
+        }
+        
+        if image_base64:
+            properties["image"] = image_base64
+        
+        # メタデータはOBJECT型のプロパティなので、辞書のまま渡す
+        if item.get("metadata"):
+            properties["metadata"] = item["metadata"]
+        
+        yield properties
+
+
+def _import_properties(
+    client: weaviate.WeaviateClient,
+    collection_name: str,
+    objects: Iterable[Dict],
+    batch_size: int,
+    concurrent_requests: int
+):
+    """準備済みのプロパティを指定されたコレクションにバッチでインポート"""
+    if not client.collections.exists(collection_name):
+        print(f"✗ コレクション '{collection_name}' が存在しません。先にスキーマを作成してください。")
+        return
+    
+    collection = client.collections.get(collection_name)
+    
+    imported_count = 0
+    with collection.batch.fixed_size(batch_size=batch_size, concurrent_requests=concurrent_requests) as batch:
+        for properties in objects:
+            batch.add_object(properties=properties)
+            imported_count += 1
+    
+    print(f"✓ {collection_name}: {imported_count}件のデータをインポートしました")
 
 
 def import_multimodal_data(
     collection_name: str,
     data_items: List[Dict],
-    batch_size: int = 10
+    batch_size: Optional[int] = None,
+    concurrent_requests: int = 4,
+    client: Optional[weaviate.WeaviateClient] = None
 ):
     """
     マルチモーダルデータを指定されたコレクションにインポート
@@ -31,48 +107,30 @@ def import_multimodal_data(
         collection_name: コレクション名
         data_items: インポートするデータのリスト
                    各アイテムは {"text": str, "image_path": str, "metadata": Optional[dict]} の形式
-        batch_size: バッチサイズ
+        batch_size: バッチサイズ（Noneの場合は画像の有無に応じて自動で決定）
+        concurrent_requests: 同時に送信するバッチリクエストの数
+        client: 使用するWeaviateクライアント（Noneの場合はこの呼び出しの間だけ接続する）
     """
-    with weaviate.connect_to_local() as client:
-        if not client.collections.exists(collection_name):
-            print(f"✗ コレクション '{collection_name}' が存在しません。先にスキーマを作成してください。")
-            return
-        
-        collection = client.collections.get(collection_name)
-        
-        imported_count = 0
-        with collection.batch.fixed_size(batch_size=batch_size) as batch:
-            for item in data_items:
-                # 画像ファイルをbase64エンコード
-                image_base64 = None
-                if "image_path" in item and item["image_path"]:
-                    image_path = item["image_path"]
-                    if os.path.exists(image_path):
-                        image_base64 = encode_image_to_base64(image_path)
-                    else:
-                        print(f"⚠ 画像ファイルが見つかりません: {image_path}")
-                
-                # メタデータをJSON文字列に変換
-                metadata_str = None
-                if "metadata" in item and item["metadata"]:
-                    metadata_str = json.dumps(item["metadata"], ensure_ascii=False)
-                
-                # プロパティを準備
-                properties = {
-                    "text": item.get("text", ""),
-                }
-                
-                if image_base64:
-                    properties["image"] = image_base64
-                
-                if metadata_str:
-                    properties["metadata"] = metadata_str
-                
-                # オブジェクトを追加
-                batch.add_object(properties=properties)
-                imported_count += 1
-        
-        print(f"✓ {collection_name}: {imported_count}件のデータをインポートしました")
+    if batch_size is None:
+        batch_size = default_batch_size(data_items)
+    
+    if client is None:
+        with weaviate.connect_to_local() as client:
+            return import_multimodal_data(
+                collection_name,
+                data_items,
+                batch_size=batch_size,
+                concurrent_requests=concurrent_requests,
+                client=client,
+            )
+    
+    _import_properties(
+        client,
+        collection_name,
+        prepare_properties(data_items),
+        batch_size,
+        concurrent_requests,
+    )
 
 
 def create_sample_data() -> List[Dict]:
@@ -101,8 +159,21 @@ def create_sample_data() -> List[Dict]:
     return sample_data
 
 
-def import_to_all_collections(data_items: List[Dict]):
-    """すべてのコレクションに同じデータをインポート"""
+def import_to_all_collections(
+    data_items: List[Dict],
+    max_workers: int = ENCODE_MAX_WORKERS,
+    concurrent_requests: int = 4
+):
+    """
+    すべてのコレクションに同じデータをインポート
+    
+    画像のエンコードは一度だけ行い、その結果をすべてのコレクションで共有します。
+    
+    Args:
+        data_items: インポートするデータのリスト
+        max_workers: 画像のエンコードに使うワーカースレッド数
+        concurrent_requests: 同時に送信するバッチリクエストの数
+    """
     collections = [
         "MultimodalData_CLIP_ViT_B_32",
         "MultimodalData_Qwen_VL",
@@ -111,16 +182,42 @@ def import_to_all_collections(data_items: List[Dict]):
     
     print("マルチモーダルデータをすべてのコレクションにインポートします...\n")
     
-    for collection_name in collections:
-        try:
-            import_multimodal_data(collection_name, data_items)
-        except Exception as e:
-            print(f"✗ {collection_name}へのインポート中にエラーが発生しました: {e}")
+    # 画像の読み込みとエンコードは一度だけ行う
+    try:
+        objects = list(prepare_properties(data_items, max_workers=max_workers))
+    except Exception as e:
+        print(f"✗ インポートするデータの準備中にエラーが発生しました: {e}")
+        return
+    batch_size = default_batch_size(data_items)
+    
+    # 3つのコレクションへのインポートで同じ接続を使い回す
+    try:
+        with weaviate.connect_to_local() as client:
+            for collection_name in collections:
+                try:
+                    _import_properties(client, collection_name, objects, batch_size, concurrent_requests)
+                except Exception as e:
+                    print(f"✗ {collection_name}へのインポート中にエラーが発生しました: {e}")
+    except Exception as e:
+        print(f"✗ Weaviateへの接続中にエラーが発生しました: {e}")
+        return
     
     print("\nインポートが完了しました！")
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="マルチモーダルデータをすべてのコレクションにインポート")
+    parser.add_argument(
+        "--parallel-encode",
+        type=int,
+        default=ENCODE_MAX_WORKERS,
+        metavar="N",
+        help=f"画像のbase64エンコードに使うワーカースレッド数（デフォルト: {ENCODE_MAX_WORKERS}）",
+    )
+    args = parser.parse_args()
+    if args.parallel_encode < 1:
+        parser.error("--parallel-encode には1以上の整数を指定してください")
+    
     # サンプルデータを作成（実際の使用時は適宜変更）
     sample_data = create_sample_data()
     
@@ -130,7 +227,7 @@ if __name__ == "__main__":
     # sample_data[2]["image_path"] = "path/to/cat.jpg"
     
     # すべてのコレクションにインポート
-    import_to_all_collections(sample_data)
+    import_to_all_collections(sample_data, max_workers=args.parallel_encode)
     
     print("\n使用例:")
     print("1. 画像ファイルのパスを指定してデータを準備")
@@ -6,21 +6,16 @@ CLIPコレクション（MultimodalData_CLIP_ViT_B_32）にデータをインポ
 """
 
 import weaviate
-import base64
-import json
-import os
 from typing import List, Dict, Optional
 
-
-def encode_image_to_base64(image_path: str) -> str:
-    """画像ファイルをbase64エンコードする"""
-    with open(image_path, "rb") as image_file:
-        return base64.b64encode(image_file.read()).decode("utf-8")
+from fast_b64 import iter_image_encodings
+from import_multimodal_data import default_batch_size
 
 
 def import_to_clip(
     data_items: List[Dict],
-    batch_size: int = 10
+    batch_size: Optional[int] = None,
+    concurrent_requests: int = 4
 ):
     """
     CLIPコレクションにデータをインポート
@@ -28,8 +23,12 @@ def import_to_clip(
     Args:
         data_items: インポートするデータのリスト
                    各アイテムは {"text": str, "image_path": Optional[str], "metadata": Optional[dict]} の形式
-        batch_size: バッチサイズ
+        batch_size: バッチサイズ（Noneの場合は画像の有無に応じて自動で決定）
+        concurrent_requests: 同時に送信するバッチリクエストの数
     """
+    if batch_size is None:
+        batch_size = default_batch_size(data_items)
+    
     collection_name = "MultimodalData_CLIP_ViT_B_32"
     
     with weaviate.connect_to_local() as client:
@@ -42,27 +41,21 @@ def import_to_clip(
         imported_count = 0
         skipped_count = 0
         
-        with collection.batch.fixed_size(batch_size=batch_size) as batch:
-            for item in data_items:
+        image_paths = [item.get("image_path") for item in data_items]
+        
+        with collection.batch.fixed_size(batch_size=batch_size, concurrent_requests=concurrent_requests) as batch:
+            # バッチ送信と並行して、少し先の画像のbase64エンコードを進める
+            for item, encoded_image in zip(data_items, iter_image_encodings(image_paths)):
                 # 画像ファイルをbase64エンコード
                 image_base64 = None
-                if "image_path" in item and item["image_path"]:
+                if encoded_image is not None:
                     image_path = item["image_path"]
-                    if os.path.exists(image_path):
-                        try:
-                            image_base64 = encode_image_to_base64(image_path)
-                        except Exception as e:
-                            print(f"⚠ 画像ファイルの読み込みに失敗しました: {image_path} - {e}")
-                    else:
-                        print(f"⚠ 画像ファイルが見つかりません: {image_path}")
-                
-                # メタデータをJSON文字列に変換
-                metadata_str = None
-                if "metadata" in item and item["metadata"]:
                     try:
-                        metadata_str = json.dumps(item["metadata"], ensure_ascii=False)
+                        image_base64 = encoded_image.result()
+                    except FileNotFoundError:
+                        print(f"⚠ 画像ファイルが見つかりません: {image_path}")
                     except Exception as e:
-                        print(f"⚠ メタデータの変換に失敗しました: {e}")
+                        print(f"⚠ 画像ファイルの読み込みに失敗しました: {image_path} - {e}")
                 
                 # プロパティを準備
                 properties = {
@@ -72,8 +65,9 @@ def import_to_clip(
                 if image_base64:
                     properties["image"] = image_base64
                 
-                if metadata_str:
-                    properties["metadata"] = metadata_str
+                # メタデータはOBJECT型のプロパティなので、辞書のまま渡す
+                if item.get("metadata"):
+                    properties["metadata"] = item["metadata"]
                 
                 # オブジェクトを追加
                 try:
@@ -5,16 +5,76 @@
 OpenAIやGemini APIを使用せず、すべてローカルで動作します。
 """
 
+import json
+import urllib.error
+import urllib.request
 import weaviate
 from weaviate.classes.generate import GenerativeConfig
-import base64
-from typing import Optional
+from typing import List, Optional
 
+from fast_b64 import QUERY_IMAGE_MAX_DIM, encode_query_image_cached
+from schema_constants import DEFAULT_RETURN_PROPERTIES
+from weaviate_client import get_client
 
-def encode_image_to_base64(image_path: str) -> str:
-    """画像ファイルをbase64エンコードする"""
-    with open(image_path, "rb") as image_file:
-        return base64.b64encode(image_file.read()).decode("utf-8")
+
+def _stream_ollama_answer(
+    question: str,
+    objects: List,
+    ollama_model: str,
+    ollama_endpoint: str
+) -> Optional[str]:
+    """
+    検索結果を基にOllamaで回答を生成し、トークンを受信した順に表示する
+    
+    Weaviateの生成モジュールは回答全体が完成するまで結果を返さないため、
+    OllamaのAPIを直接ストリーミングモードで呼び出します。
+    
+    Returns:
+        生成された回答テキスト（全体）
+    """
+    context = "\n".join(
+        f"- {obj.properties.get('text', '')} (metadata: {obj.properties.get('metadata')})"
+        for obj in objects
+    )
+    prompt = f"以下の検索結果を参考にして、質問に答えてください。\n\n検索結果:\n{context}\n\n質問: {question}"
+    
+    request = urllib.request.Request(
+        f"{ollama_endpoint}/api/generate",
+        data=json.dumps({"model": ollama_model, "prompt": prompt, "stream": True}).encode("utf-8"),
+        headers={"Content-Type": "application/json"},
+    )
+    
+    tokens = []
+    try:
+        with urllib.request.urlopen(request) as response:
+            # 1行に1つのJSONオブジェクトが届く
+            for line in response:
+                if not line.strip():
+                    continue
+                chunk = json.loads(line)
+                if "error" in chunk:
+                    # 途中まで表示したトークンの後で改行してからエラーを表示する
+                    if tokens:
+                        print()
+                    print(f"✗ Ollamaでの回答生成中にエラーが発生しました: {chunk['error']}")
+                    return None
+                token = chunk.get("response", "")
+                print(token, end="", flush=True)
+                tokens.append(token)
+                if chunk.get("done"):
+                    break
+    except urllib.error.HTTPError as e:
+        print(f"✗ Ollama APIがエラーを返しました: {e.code} {e.reason}")
+        return None
+    except OSError as e:
+        # URLError（接続失敗）や受信中の切断など
+        if tokens:
+            print()
+        print(f"✗ Ollama API ({ollama_endpoint}) との通信に失敗しました: {getattr(e, 'reason', e)}")
+        return None
+    print()
+    
+    return "".join(tokens) or None
 
 
 def rag_with_text_query(
@@ -23,7 +83,10 @@ def rag_with_text_query(
     question: str,
     limit: int = 3,
     ollama_model: str = "llama3.2",
-    ollama_endpoint: str = "http://localhost:11434"
+    ollama_endpoint: str = "http://localhost:11434",
+    client: Optional[weaviate.WeaviateClient] = None,
+    stream: bool = False,
+    ollama_client_endpoint: str = "http://localhost:11434"
 ):
     """
     テキストクエリで検索し、検索結果を基に回答を生成
@@ -34,31 +97,48 @@ def rag_with_text_query(
         question: 回答を生成するための質問
         limit: 検索結果の数
         ollama_model: 使用するOllamaモデル名
-        ollama_endpoint: Ollama APIエンドポイント
+        ollama_endpoint: WeaviateからアクセスするOllama APIエンドポイント（stream=Falseの場合に使用。
+            Weaviateのコンテナ内から解決されるため、Docker Composeではhttp://ollama:11434など）
+        client: 使用するWeaviateクライアント（Noneの場合は共有クライアントを使用）
+        stream: Trueの場合、検索後にOllamaから回答をストリーミングで受け取り、逐次表示する
+        ollama_client_endpoint: このスクリプトから直接アクセスするOllama APIエンドポイント
+            （stream=Trueの場合に使用。ホスト側から解決されるため、http://localhost:11434など）
     
     Returns:
         生成された回答テキスト
     """
-    with weaviate.connect_to_local() as client:
-        if not client.collections.exists(collection_name):
-            print(f"✗ コレクション '{collection_name}' が存在しません。")
-            return None
-        
-        collection = client.collections.get(collection_name)
-        
-        # マルチモーダル検索と回答生成を同時に実行
-        response = collection.generate.near_text(
+    if client is None:
+        client = get_client()
+    
+    if not client.collections.exists(collection_name):
+        print(f"✗ コレクション '{collection_name}' が存在しません。")
+        return None
+    
+    collection = client.collections.get(collection_name)
+    
+    if stream:
+        # 検索のみWeaviateで行い、回答はOllamaから逐次受け取る
+        response = collection.query.near_text(
             query=query_text,
             limit=limit,
-            grouped_task=question,
-            generative_provider=GenerativeConfig.ollama(
-                api_endpoint=ollama_endpoint,
-                model=ollama_model,
-            ),
-            return_properties=["text", "image", "metadata"],
+            return_properties=DEFAULT_RETURN_PROPERTIES,
         )
-        
-        return response.generative.text if response.generative else None
+        return _stream_ollama_answer(question, response.objects, ollama_model, ollama_client_endpoint)
+    
+    # マルチモーダル検索と回答生成を同時に実行
+    response = collection.generate.near_text(
+        query=query_text,
+        limit=limit,
+        grouped_task=question,
+        generative_provider=GenerativeConfig.ollama(
+            api_endpoint=ollama_endpoint,
+            model=ollama_model,
+        ),
+        # 回答生成はサーバー側で行われるため、画像をクライアントに返却する必要はない
+        return_properties=DEFAULT_RETURN_PROPERTIES,
+    )
+    
+    return response.generative.text if response.generative else None
 
 
 def rag_with_image_query(
@@ -67,7 +147,11 @@ def rag_with_image_query(
     question: str,
     limit: int = 3,
     ollama_model: str = "llama3.2",
-    ollama_endpoint: str = "http://localhost:11434"
+    ollama_endpoint: str = "http://localhost:11434",
+    client: Optional[weaviate.WeaviateClient] = None,
+    stream: bool = False,
+    max_dim: Optional[int] = None,
+    ollama_client_endpoint: str = "http://localhost:11434"
 ):
     """
     画像クエリで検索し、検索結果を基に回答を生成
@@ -78,34 +162,52 @@ def rag_with_image_query(
         question: 回答を生成するための質問
         limit: 検索結果の数
         ollama_model: 使用するOllamaモデル名
-        ollama_endpoint: Ollama APIエンドポイント
+        ollama_endpoint: WeaviateからアクセスするOllama APIエンドポイント（stream=Falseの場合に使用。
+            Weaviateのコンテナ内から解決されるため、Docker Composeではhttp://ollama:11434など）
+        client: 使用するWeaviateクライアント（Noneの場合は共有クライアントを使用）
+        stream: Trueの場合、検索後にOllamaから回答をストリーミングで受け取り、逐次表示する
+        max_dim: クエリ画像を縮小する最大辺のピクセル数（Noneの場合は元の画像を使用）
+        ollama_client_endpoint: このスクリプトから直接アクセスするOllama APIエンドポイント
+            （stream=Trueの場合に使用。ホスト側から解決されるため、http://localhost:11434など）
     
     Returns:
         生成された回答テキスト
     """
-    with weaviate.connect_to_local() as client:
-        if not client.collections.exists(collection_name):
-            print(f"✗ コレクション '{collection_name}' が存在しません。")
-            return None
-        
-        collection = client.collections.get(collection_name)
-        
-        # 画像をbase64エンコード
-        image_base64 = encode_image_to_base64(image_path)
-        
-        # マルチモーダル検索と回答生成を同時に実行
-        response = collection.generate.near_image(
+    if client is None:
+        client = get_client()
+    
+    if not client.collections.exists(collection_name):
+        print(f"✗ コレクション '{collection_name}' が存在しません。")
+        return None
+    
+    collection = client.collections.get(collection_name)
+    
+    # 画像をbase64エンコード（同じ画像の再エンコードはキャッシュで省略）
+    image_base64 = encode_query_image_cached(image_path, max_dim)
+    
+    if stream:
+        # 検索のみWeaviateで行い、回答はOllamaから逐次受け取る
+        response = collection.query.near_image(
             near_image=image_base64,
             limit=limit,
-            grouped_task=question,
-            generative_provider=GenerativeConfig.ollama(
-                api_endpoint=ollama_endpoint,
-                model=ollama_model,
-            ),
-            return_properties=["text", "image", "metadata"],
+            return_properties=DEFAULT_RETURN_PROPERTIES,
         )
-        
-        return response.generative.text if response.generative else None
+        return _stream_ollama_answer(question, response.objects, ollama_model, ollama_client_endpoint)
+    
+    # マルチモーダル検索と回答生成を同時に実行
+    response = collection.generate.near_image(
+        near_image=image_base64,
+        limit=limit,
+        grouped_task=question,
+        generative_provider=GenerativeConfig.ollama(
+            api_endpoint=ollama_endpoint,
+            model=ollama_model,
+        ),
+        # 回答生成はサーバー側で行われるため、画像をクライアントに返却する必要はない
+        return_properties=DEFAULT_RETURN_PROPERTIES,
+    )
+    
+    return response.generative.text if response.generative else None
 
 
 def demo_multimodal_rag():
@@ -120,16 +222,17 @@ def demo_multimodal_rag():
     print("   検索クエリ: 'beautiful sunset'")
     print("   質問: 'この画像について説明してください'")
     
+    # 回答はストリーミングで受信した順に表示される
+    print("\n回答:")
     answer = rag_with_text_query(
         collection_name=collection_name,
         query_text="beautiful sunset",
         question="この画像について説明してください",
-        limit=3
+        limit=3,
+        stream=True
     )
     
-    if answer:
-        print(f"\n回答:\n{answer}")
-    else:
+    if not answer:
         print("回答の生成に失敗しました")
     
     # 画像クエリによるRAG（画像ファイルのパスが必要）
@@ -137,16 +240,17 @@ def demo_multimodal_rag():
     # print("   クエリ画像: 'path/to/query_image.jpg'")
     # print("   質問: 'この画像と類似した画像について説明してください'")
     # 
+    # print("\n回答:")
     # answer = rag_with_image_query(
     #     collection_name=collection_name,
     #     image_path="path/to/query_image.jpg",
     #     question="この画像と類似した画像について説明してください",
-    #     limit=3
+    #     limit=3,
+    #     stream=True,
+    #     max_dim=QUERY_IMAGE_MAX_DIM  # CLIPの入力解像度に合わせて縮小して送信
     # )
     # 
-    # if answer:
-    #     print(f"\n回答:\n{answer}")
-    # else:
+    # if not answer:
     #     print("回答の生成に失敗しました")
     
     print("\n" + "="*60)
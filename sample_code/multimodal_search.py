@@ -9,22 +9,22 @@
 """
 
 import weaviate
-import base64
+from weaviate.classes.query import QueryNested
 import json
-from typing import List, Optional
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List, Optional, Sequence, Union
 
-
-def encode_image_to_base64(image_path: str) -> str:
-    """画像ファイルをbase64エンコードする"""
-    with open(image_path, "rb") as image_file:
-        return base64.b64encode(image_file.read()).decode("utf-8")
+from fast_b64 import QUERY_IMAGE_MAX_DIM, encode_query_image_cached
+from schema_constants import DEFAULT_RETURN_PROPERTIES, DISTANCE_METADATA
+from weaviate_client import get_client
 
 
 def search_by_text(
     collection_name: str,
     query_text: str,
     limit: int = 5,
-    return_properties: Optional[List[str]] = None
+    return_properties: Optional[Sequence[Union[str, QueryNested]]] = None,
+    client: Optional[weaviate.WeaviateClient] = None
 ):
     """
     テキストクエリによる検索
@@ -33,45 +33,50 @@ def search_by_text(
         collection_name: コレクション名
         query_text: 検索クエリテキスト
         limit: 返却する結果の数
-        return_properties: 返却するプロパティのリスト（Noneの場合はすべて）
+        return_properties: 返却するプロパティのリスト（Noneの場合はtextとmetadata）
+        client: 使用するWeaviateクライアント（Noneの場合は共有クライアントを使用）
     
     Returns:
         検索結果のリスト
     """
-    with weaviate.connect_to_local() as client:
-        if not client.collections.exists(collection_name):
-            print(f"✗ コレクション '{collection_name}' が存在しません。")
-            return []
-        
-        collection = client.collections.get(collection_name)
-        
-        if return_properties is None:
-            return_properties = ["text", "image", "metadata"]
-        
-        response = collection.query.near_text(
-            query=query_text,
-            limit=limit,
-            return_metadata=weaviate.classes.query.MetadataQuery(distance=True),
-            return_properties=return_properties,
-        )
-        
-        results = []
-        for obj in response.objects:
-            result = {
-                "uuid": str(obj.uuid),
-                "distance": obj.metadata.distance if obj.metadata else None,
-                "properties": obj.properties,
-            }
-            results.append(result)
-        
-        return results
+    if client is None:
+        client = get_client()
+    
+    if not client.collections.exists(collection_name):
+        print(f"✗ コレクション '{collection_name}' が存在しません。")
+        return []
+    
+    collection = client.collections.get(collection_name)
+    
+    if return_properties is None:
+        return_properties = DEFAULT_RETURN_PROPERTIES
+    
+    response = collection.query.near_text(
+        query=query_text,
+        limit=limit,
+        return_metadata=DISTANCE_METADATA,
+        return_properties=return_properties,
+    )
+    
+    results = []
+    for obj in response.objects:
+        result = {
+            "uuid": str(obj.uuid),
+            "distance": obj.metadata.distance if obj.metadata else None,
+            "properties": obj.properties,
+        }
+        results.append(result)
+    
+    return results
 
 
 def search_by_image(
     collection_name: str,
     image_path: str,
     limit: int = 5,
-    return_properties: Optional[List[str]] = None
+    return_properties: Optional[Sequence[Union[str, QueryNested]]] = None,
+    client: Optional[weaviate.WeaviateClient] = None,
+    max_dim: Optional[int] = None
 ):
     """
     画像クエリによる検索
@@ -80,41 +85,105 @@ def search_by_image(
         collection_name: コレクション名
         image_path: 検索に使用する画像ファイルのパス
         limit: 返却する結果の数
-        return_properties: 返却するプロパティのリスト（Noneの場合はすべて）
+        return_properties: 返却するプロパティのリスト（Noneの場合はtextとmetadata）
+        client: 使用するWeaviateクライアント（Noneの場合は共有クライアントを使用）
+        max_dim: クエリ画像を縮小する最大辺のピクセル数（Noneの場合は元の画像を使用）
     
     Returns:
         検索結果のリスト
     """
-    with weaviate.connect_to_local() as client:
-        if not client.collections.exists(collection_name):
-            print(f"✗ コレクション '{collection_name}' が存在しません。")
-            return []
-        
-        collection = client.collections.get(collection_name)
-        
-        # 画像をbase64エンコード
-        image_base64 = encode_image_to_base64(image_path)
-        
-        if return_properties is None:
-            return_properties = ["text", "image", "metadata"]
-        
-        response = collection.query.near_image(
-            near_image=image_base64,
-            limit=limit,
-            return_metadata=weaviate.classes.query.MetadataQuery(distance=True),
-            return_properties=return_properties,
-        )
-        
-        results = []
-        for obj in response.objects:
-            result = {
-                "uuid": str(obj.uuid),
-                "distance": obj.metadata.distance if obj.metadata else None,
-                "properties": obj.properties,
-            }
-            results.append(result)
-        
-        return results
+    # 画像をbase64エンコード（同じ画像の再エンコードはキャッシュで省略）
+    image_base64 = encode_query_image_cached(image_path, max_dim)
+    
+    return search_by_image_b64(
+        collection_name=collection_name,
+        image_base64=image_base64,
+        limit=limit,
+        return_properties=return_properties,
+        client=client,
+    )
+
+
+def search_by_image_b64(
+    collection_name: str,
+    image_base64: str,
+    limit: int = 5,
+    return_properties: Optional[Sequence[Union[str, QueryNested]]] = None,
+    client: Optional[weaviate.WeaviateClient] = None
+):
+    """
+    base64エンコード済みの画像クエリによる検索
+    
+    Args:
+        collection_name: コレクション名
+        image_base64: base64エンコード済みのクエリ画像
+        limit: 返却する結果の数
+        return_properties: 返却するプロパティのリスト（Noneの場合はtextとmetadata）
+        client: 使用するWeaviateクライアント（Noneの場合は共有クライアントを使用）
+    
+    Returns:
+        検索結果のリスト
+    """
+    if client is None:
+        client = get_client()
+    
+    if not client.collections.exists(collection_name):
+        print(f"✗ コレクション '{collection_name}' が存在しません。")
+        return []
+    
+    collection = client.collections.get(collection_name)
+    
+    if return_properties is None:
+        return_properties = DEFAULT_RETURN_PROPERTIES
+    
+    response = collection.query.near_image(
+        near_image=image_base64,
+        limit=limit,
+        return_metadata=DISTANCE_METADATA,
+        return_properties=return_properties,
+    )
+    
+    results = []
+    for obj in response.objects:
+        result = {
+            "uuid": str(obj.uuid),
+            "distance": obj.metadata.distance if obj.metadata else None,
+            "properties": obj.properties,
+        }
+        results.append(result)
+    
+    return results
+
+
+def fetch_image(
+    collection_name: str,
+    uuid: str,
+    client: Optional[weaviate.WeaviateClient] = None
+) -> Optional[str]:
+    """
+    検索結果のUUIDを指定して画像データのみを取得
+    
+    Args:
+        collection_name: コレクション名
+        uuid: オブジェクトのUUID
+        client: 使用するWeaviateクライアント（Noneの場合は共有クライアントを使用）
+    
+    Returns:
+        base64エンコードされた画像（存在しない場合はNone）
+    """
+    if client is None:
+        client = get_client()
+    
+    if not client.collections.exists(collection_name):
+        print(f"✗ コレクション '{collection_name}' が存在しません。")
+        return None
+    
+    collection = client.collections.get(collection_name)
+    obj = collection.query.fetch_object_by_id(uuid, return_properties=["image"])
+    
+    if obj is None:
+        return None
+    return obj.properties.get("image")
 
 
 def print_search_results(results: List[dict], query_type: str):
@@ -131,17 +200,12 @@ def print_search_results(results: List[dict], query_type: str):
         props = result.get('properties', {})
         if 'text' in props:
             text = props['text']
-            # 長いテキストは切り詰め
-            if len(text) > 100:
-                text = text[:100] + "..."
-            print(f"  テキスト: {text}")
+            # 長いテキストは切り詰め（精度指定で切り詰めるため、中間の文字列を作らない）
+            print(f"  テキスト: {text:.100s}{'...' if len(text) > 100 else ''}")
         
         if 'metadata' in props and props['metadata']:
-            try:
-                metadata = json.loads(props['metadata'])
-                print(f"  メタデータ: {json.dumps(metadata, ensure_ascii=False, indent=4)}")
-            except:
-                print(f"  メタデータ: {props['metadata']}")
+            # metadataはOBJECT型のため、辞書として返却される
+            print(f"  メタデータ: {json.dumps(props['metadata'], ensure_ascii=False, indent=4)}")
         
         if 'image' in props:
             image_len = len(props['image']) if props['image'] else 0
@@ -171,7 +235,8 @@ def demo_multimodal_search():
     # image_results = search_by_image(
     #     collection_name=collection_name,
     #     image_path="path/to/query_image.jpg",
-    #     limit=3
+    #     limit=3,
+    #     max_dim=QUERY_IMAGE_MAX_DIM  # CLIPの入力解像度に合わせて縮小して送信
     # )
     # print_search_results(image_results, "画像クエリ")
     
@@ -193,6 +258,9 @@ def compare_models(query_text: str, image_path: Optional[str] = None):
         "MultimodalData_Qwen_VL",
         "MultimodalData_Cohere_Vision",
     ]
+    query_max_dims = {
+        "MultimodalData_CLIP_ViT_B_32": QUERY_IMAGE_MAX_DIM,
+    }
     
     print(f"\n{'='*60}")
     print("複数モデルの比較検索")
@@ -202,32 +270,57 @@ def compare_models(query_text: str, image_path: Optional[str] = None):
         print(f"画像: {image_path}")
     print()
     
-    for collection_name in collections:
-        print(f"\n--- {collection_name} ---")
-        
+    # 3つのコレクションへの検索で同じ接続を共有する
+    # （gRPCはHTTP/2上で多重化されるため、スレッドごとに接続を作る必要はない）
+    client = get_client()
+    
+    # クエリ画像の縮小はCLIPの入力解像度に合わせたものなので、CLIPのコレクションにのみ適用する。
+    # 同じ縮小サイズの画像は一度だけエンコードし、コレクション間で共有する
+    image_base64s = {}
+    if image_path:
+        image_base64s = {
+            name: encode_query_image_cached(image_path, query_max_dims.get(name))
+            for name in collections
+        }
+    
+    def search(collection_name: str):
         if image_path:
-            results = search_by_image(
-                collection_name=collection_name,
-                image_path=image_path,
-                limit=3
-            )
-        else:
-            results = search_by_text(
+            return search_by_image_b64(
                 collection_name=collection_name,
-                query_text=query_text,
-                limit=3
+                image_base64=image_base64s[collection_name],
+                limit=3,
+                client=client
             )
+        return search_by_text(
+            collection_name=collection_name,
+            query_text=query_text,
+            limit=3,
+            client=client
+        )
+    
+    # 各コレクションの検索は互いに独立しているため並行して実行し、完了した順に表示する
+    with ThreadPoolExecutor(max_workers=len(collections)) as executor:
+        futures = {executor.submit(search, name): name for name in collections}
         
-        if results:
-            print(f"  検索結果: {len(results)}件")
-            for i, result in enumerate(results[:2], 1):  # 上位2件を表示
-                props = result.get('properties', {})
-                text = props.get('text', 'N/A')
-                if len(text) > 50:
-                    text = text[:50] + "..."
-                print(f"    {i}. {text} (距離: {result['distance']:.4f})")
-        else:
-            print("  検索結果なし")
+        for future in as_completed(futures):
+            collection_name = futures[future]
+            print(f"\n--- {collection_name} ---")
+            
+            # 1つのコレクションの検索が失敗しても、他のコレクションの結果は表示する
+            try:
+                results = future.result()
+            except Exception as e:
+                print(f"  ✗ {collection_name}: {e}")
+                continue
+            
+            if results:
+                print(f"  検索結果: {len(results)}件")
+                for i, result in enumerate(results[:2], 1):  # 上位2件を表示
+                    props = result.get('properties', {})
+                    text = props.get('text', 'N/A')
+                    print(f"    {i}. {text:.50s}{'...' if len(text) > 50 else ''} (距離: {result['distance']:.4f})")
+            else:
+                print("  検索結果なし")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,29 @@
+"""
+マルチモーダルコレクションのスキーマと検索で共有する定数
+
+metadataプロパティのネストしたプロパティは、スキーマ作成時と検索時で
+同じ定義を使う必要があるため、ここで一度だけ定義します。
+"""
+
+from weaviate.classes.config import DataType, Property
+from weaviate.classes.query import MetadataQuery, QueryNested
+
+
+# metadataプロパティ（OBJECT型）のネストしたプロパティ
+METADATA_NESTED_PROPERTIES = [
+    Property(name="category", data_type=DataType.TEXT),
+    Property(name="tags", data_type=DataType.TEXT_ARRAY),
+]
+
+# 検索結果として返却するプロパティ（OBJECT型のmetadataはネストしたプロパティの指定が必要）
+# 画像（base64）はサイズが大きいため含めない
+DEFAULT_RETURN_PROPERTIES = (
+    "text",
+    QueryNested(
+        name="metadata",
+        properties=[prop.name for prop in METADATA_NESTED_PROPERTIES],
+    ),
+)
+
+# 検索のたびに生成しないよう、距離を返却するメタデータクエリを共有する
+DISTANCE_METADATA = MetadataQuery(distance=True)
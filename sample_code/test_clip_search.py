@@ -4,76 +4,94 @@ CLIPコレクションの検索テストスクリプト
 インポートしたデータが正しく検索できるか確認します。
 """
 
+import argparse
 import weaviate
+from typing import Optional
 
+from schema_constants import DEFAULT_RETURN_PROPERTIES, DISTANCE_METADATA
+from weaviate_client import get_client
 
-def test_clip_search():
-    """CLIPコレクションで検索をテスト"""
+
+def test_clip_search(
+    client: Optional[weaviate.WeaviateClient] = None,
+    with_count: bool = False
+):
+    """
+    CLIPコレクションで検索をテスト
+    
+    Args:
+        client: 使用するWeaviateクライアント（Noneの場合は共有クライアントを使用）
+        with_count: Trueの場合、検索前にコレクション内のデータ数を集計して表示する
+    """
     collection_name = "MultimodalData_CLIP_ViT_B_32"
     
-    with weaviate.connect_to_local() as client:
-        if not client.collections.exists(collection_name):
-            print(f"✗ コレクション '{collection_name}' が存在しません。")
-            return
-        
-        collection = client.collections.get(collection_name)
-        
-        # コレクション内のデータ数を確認
+    if client is None:
+        client = get_client()
+    
+    if not client.collections.exists(collection_name):
+        print(f"✗ コレクション '{collection_name}' が存在しません。")
+        return
+    
+    collection = client.collections.get(collection_name)
+    
+    # コレクション内のデータ数を確認（集計クエリが走るため、指定された場合のみ）
+    if with_count:
         total_count = collection.aggregate.over_all(total_count=True).total_count
         print(f"コレクション内のデータ数: {total_count}件\n")
         
         if total_count == 0:
             print("⚠ データがインポートされていません。")
             return
-        
-        # テキストクエリによる検索
-        print("="*60)
-        print("テキストクエリによる検索テスト")
-        print("="*60)
-        print("クエリ: 'beautiful sunset'")
-        print()
-        
-        response = collection.query.near_text(
-            query="beautiful sunset",
-            limit=3,
-            return_metadata=weaviate.classes.query.MetadataQuery(distance=True),
-            return_properties=["text", "metadata"],
-        )
-        
-        if response.objects:
-            print(f"検索結果: {len(response.objects)}件\n")
-            for i, obj in enumerate(response.objects, 1):
-                print(f"結果 {i}:")
-                print(f"  UUID: {obj.uuid}")
-                if obj.metadata:
-                    print(f"  距離: {obj.metadata.distance:.4f}")
-                
-                props = obj.properties
-                if 'text' in props:
-                    text = props['text']
-                    if len(text) > 80:
-                        text = text[:80] + "..."
-                    print(f"  テキスト: {text}")
-                
-                if 'metadata' in props and props['metadata']:
-                    try:
-                        import json
-                        metadata = json.loads(props['metadata'])
-                        print(f"  メタデータ: {metadata}")
-                    except:
-                        print(f"  メタデータ: {props['metadata']}")
-                print()
-        else:
-            print("検索結果が見つかりませんでした。")
-        
-        print("="*60)
-        print("検索テスト完了")
-        print("="*60)
+    
+    # テキストクエリによる検索
+    print("="*60)
+    print("テキストクエリによる検索テスト")
+    print("="*60)
+    print("クエリ: 'beautiful sunset'")
+    print()
+    
+    response = collection.query.near_text(
+        query="beautiful sunset",
+        limit=3,
+        return_metadata=DISTANCE_METADATA,
+        return_properties=DEFAULT_RETURN_PROPERTIES,
+    )
+    
+    if response.objects:
+        print(f"検索結果: {len(response.objects)}件\n")
+        for i, obj in enumerate(response.objects, 1):
+            print(f"結果 {i}:")
+            print(f"  UUID: {obj.uuid}")
+            if obj.metadata:
+                print(f"  距離: {obj.metadata.distance:.4f}")
+            
+            props = obj.properties
+            if 'text' in props:
+                text = props['text']
+                print(f"  テキスト: {text:.80s}{'...' if len(text) > 80 else ''}")
+            
+            if 'metadata' in props and props['metadata']:
+                print(f"  メタデータ: {props['metadata']}")
+            print()
+    else:
+        print("検索結果が見つかりませんでした。")
+    
+    print("="*60)
+    print("検索テスト完了")
+    print("="*60)
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="CLIPコレクションの検索テスト")
+    parser.add_argument(
+        "--with-count",
+        action="store_true",
+        help="検索前にコレクション内のデータ数を集計して表示する",
+    )
+    args = parser.parse_args()
+    
     try:
-        test_clip_search()
+        test_clip_search(with_count=args.with_count)
     except Exception as e:
         print(f"\n✗ エラーが発生しました: {e}")
         import traceback
@@ -0,0 +1,50 @@
+"""
+Weaviateクライアントの共有ヘルパー
+
+検索やRAGのたびに接続を作り直すと、HTTP/gRPCのハンドシェイクが毎回発生します。
+get_client()はローカルのWeaviateへの接続を一度だけ作成してキャッシュし、
+プロセス終了時に自動でクローズします。
+"""
+
+import atexit
+from typing import Optional
+
+import weaviate
+from weaviate.classes.init import AdditionalConfig, GrpcConfig, Timeout
+
+
+_client: Optional[weaviate.WeaviateClient] = None
+
+# 共有クライアントはRAGの回答生成など時間のかかるクエリにも使うため、タイムアウトに余裕を持たせる。
+# また、gRPCのkeepaliveを有効にし、実行中の呼び出しがある間は30秒ごとにpingを送って、
+# 応答待ちの間に接続が切れていれば10秒以内に検出する
+# （keepalive_permit_without_callsは指定していないため、呼び出しがないアイドル中はpingを送らない）
+_ADDITIONAL_CONFIG = AdditionalConfig(
+    timeout=Timeout(query=60),
+    grpc_config=GrpcConfig(
+        channel_options=[
+            ("grpc.keepalive_time_ms", 30000),
+            ("grpc.keepalive_timeout_ms", 10000),
+            ("grpc.http2.max_pings_without_data", 0),
+        ],
+    ),
+)
+
+
+def get_client() -> weaviate.WeaviateClient:
+    """共有のWeaviateクライアントを取得する（初回呼び出し時に接続）"""
+    global _client
+    if _client is None:
+        _client = weaviate.connect_to_local(additional_config=_ADDITIONAL_CONFIG)
+    return _client
+
+
+def close_client():
+    """共有のWeaviateクライアントをクローズする"""
+    global _client
+    if _client is not None:
+        _client.close()
+        _client = None
+
+
+atexit.register(close_client)